@@ -3,12 +3,123 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
+import plotly.io as pio
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from solver import find_optimal_schedule 
 import ast # Need this for safely turning that string input back into a Python list!
 
 st.set_page_config(layout="wide", page_title="UAT Scheduling Optimizer")
 
+# Default for how long the solver may search (adjustable in the sidebar).
+SOLVER_TIME_LIMIT_SECONDS = 30
+
+def parse_workstreams(raw):
+    """Turns the editor's "['Finance', 'IT']" string back into a Python list."""
+    # Blank cells come through as None/NaN rather than strings: nothing required.
+    if pd.api.types.is_scalar(raw) and pd.isna(raw):
+        return []
+    raw = str(raw).strip()
+    if not raw:
+        return []
+    if raw.startswith('[') and raw.endswith(']'):
+        inner = raw[1:-1].strip()
+        if not inner:
+            return []
+        tokens = [t.strip() for t in inner.split(',')]
+        # Fast path: every token is a plain, properly quoted name (no backslash escapes to interpret).
+        if all(
+            len(t) >= 2 and t[0] == t[-1] and t[0] in '\'"' and t[0] not in t[1:-1] and '\\' not in t
+            for t in tokens
+        ):
+            return [t[1:-1] for t in tokens]
+    try:
+        # Anything unusual goes through the safe (but slower) literal parser.
+        ws_list = ast.literal_eval(raw)
+        if not isinstance(ws_list, list):
+            ws_list = [raw]
+        elif not all(isinstance(ws, (str, int, float, bool)) for ws in ws_list):
+            ws_list = [] # Nested lists and the like can't name a workstream, so treat it as a format mistake.
+    except (ValueError, SyntaxError):
+        ws_list = [] # If they mess up the format, it's okay, we'll just skip it.
+    # The solver looks workstreams up by name, so make sure every entry is a plain string.
+    return [str(ws) for ws in ws_list]
+
+@st.cache_data
+def parse_scenarios(scenario_df):
+    """Converts the scenario editor table into the list of dicts the solver expects."""
+    names = scenario_df['name'].map(str).to_numpy()
+    durations = scenario_df['duration_hours'].to_numpy()
+    raw_workstreams = scenario_df['required_workstreams'].fillna('').map(str).to_numpy()
+    return [
+        {
+            'name': name,
+            'duration_hours': duration_hours,
+            'required_workstreams': parse_workstreams(ws_raw)
+        }
+        for name, duration_hours, ws_raw in zip(names, durations, raw_workstreams)
+    ]
+
+@st.cache_data(show_spinner=False)
+def solve(scenario_data, personnel_data, start_date_str, num_workers, time_limit):
+    """Runs the solver, but only once for any given set of inputs."""
+    return find_optimal_schedule(
+        scenario_data, personnel_data, start_date_str,
+        num_workers=num_workers, max_time_in_seconds=float(time_limit)
+    )
+
+@st.cache_data
+def build_gantt(schedule_df):
+    """Builds the Gantt chart for a schedule and hands it back as Plotly JSON."""
+    # This is the final visual: Scenario is on the Y-axis, and we'll use the hover text to show who's assigned!
+    fig = px.timeline(
+        schedule_df,
+        x_start="Start_DT", 
+        x_end="Finish_DT", 
+        y="Scenario",
+        color="Workstreams",
+        hover_name="Scenario",
+        # Including the key details in the tooltip.
+        hover_data=['Assigned Persons', 'Workstreams', 'Duration (Hours)', 'Start Time', 'End Time'], 
+        title="UAT Scenario Timeline by Resource Allocation"
+    )
+    fig.update_yaxes(autorange="reversed") 
+    return fig.to_json()
+
+def hash_inputs(scenario_data, personnel_data, start_date_str):
+    """A fingerprint of everything the solver looks at, so we can tell when a rerun changed nothing."""
+    return hashlib.sha256(repr((scenario_data, personnel_data, start_date_str)).encode()).hexdigest()
+
+def show_results(schedule_df, total_days, is_optimal):
+    """Renders the metric, table and Gantt chart for a solved schedule."""
+    # --- 3. Check Out the Results! ---
+    st.header("3. optimal UAT Schedule" if is_optimal else "3. best UAT Schedule found")
+
+    # Key metric up front!
+    st.metric("Total UAT Duration ", f"{total_days:.1f} Days")
+
+    # Format the times for display right before they're shown (vectorized, not row by row).
+    schedule_df = schedule_df.assign(**{
+        'Start Time': schedule_df['Start_DT'].dt.strftime('%Y-%m-%d %H:%M'),
+        'End Time': schedule_df['Finish_DT'].dt.strftime('%Y-%m-%d %H:%M'),
+    })
+
+    # Data Table
+    st.subheader("scheduled Details")
+    st.dataframe(
+        schedule_df[['Scenario', 'Duration (Hours)', 'Start Time', 'End Time', 'Assigned Persons', 'Workstreams']],
+        width='stretch'
+    )
+
+    # --- Gantt Chart Visualization ---
+    st.subheader("gantt chart visualization")
+
+    # The figure only gets rebuilt when the schedule actually changes.
+    fig = pio.from_json(build_gantt(schedule_df))
+    st.plotly_chart(fig, width='stretch', config={})
+
 def app():
     st.title("Scheduling Optimizer")
     st.markdown("This tool uses CSP to find the **best possible multi-resource schedule** for your cross-workstream UAT!")
@@ -19,6 +130,11 @@ def app():
     # First, when does this whole thing kick off?
     start_date = st.date_input("Select UAT Start Date", datetime.now())
     start_date_str = start_date.strftime('%Y-%m-%d')
+
+    # Power users can trade more CPU for a faster answer.
+    num_workers = st.sidebar.slider("Solver Workers", 1, 16, 8)
+    # The solver gives up after this long, so it's also what the progress bar counts towards.
+    time_limit = st.sidebar.slider("Solver Time Limit (seconds)", 5, 300, SOLVER_TIME_LIMIT_SECONDS)
     
     # Using tabs keeps the interface nice and tidy.
     tab1, tab2 = st.tabs(["Personnel (Resources)", "UAT Scenarios (Tasks)"])
@@ -65,26 +181,14 @@ def app():
         )
         
         # We need some special handling to clean up the user's list input.
-        scenario_data = []
-        for index, row in scenario_df.iterrows():
-            try:
-                # Safely converting the user's string input back to a Python list.
-                ws_list = ast.literal_eval(str(row['required_workstreams'])) 
-                if not isinstance(ws_list, list):
-                    ws_list = [str(row['required_workstreams'])]
-            except (ValueError, SyntaxError):
-                ws_list = [] # If they mess up the format, it's okay, we'll just skip it.
-            
-            scenario_data.append({
-                'name': str(row['name']),
-                'duration_hours': row['duration_hours'],
-                'required_workstreams': ws_list
-            })
+        scenario_data = parse_scenarios(scenario_df)
     
     
     # --- 2. Time to Crunch the Numbers! ---
     st.header("2. Generate Schedule")
 
+    inputs_hash = hash_inputs(scenario_data, personnel_data, start_date_str)
+
     if st.button("🚀 Find Optimal Schedule"):
         # Quick validation check, wouldn't want to run on empty data!
         if not personnel_data or not scenario_data or len(personnel_data) == 0 or len(scenario_data) == 0:
@@ -93,46 +197,52 @@ def app():
 
         with st.spinner("Solving some really tough resource allocation problems"):
             
-            # Sending the data off to our smart solver function.
-            schedule_df, total_days = find_optimal_schedule(scenario_data, personnel_data, start_date_str)
+            # Sending the data off to our smart solver function, on a worker thread so the page keeps updating.
+            # CP-SAT does its heavy lifting in C++ and releases the GIL, so a thread is enough here.
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                future = executor.submit(solve, scenario_data, personnel_data, start_date_str, num_workers, time_limit)
+
+                progress = st.progress(0.0)
+                started = time.monotonic()
+                while not future.done():
+                    elapsed = time.monotonic() - started
+                    progress.progress(min(elapsed / time_limit, 1.0), text=f"Searching... {elapsed:.0f}s")
+                    time.sleep(0.1)
+                progress.empty()
+
+                schedule_df, total_days, status = future.result()
+
+            is_optimal = status == 'OPTIMAL'
+            if status in ('FEASIBLE', 'UNKNOWN'):
+                # Don't hang on to an answer the time limit cut short, the next run might do better.
+                solve.clear(scenario_data, personnel_data, start_date_str, num_workers, time_limit)
+
+            if status == 'UNKNOWN':
+                 st.error(
+                     f"No schedule found within the {time_limit}s time limit. Your input may be fine, the problem "
+                     "is just big: raise the time limit or add more workers in the sidebar."
+                 )
+                 return
             
             if schedule_df is None or schedule_df.empty:
-                 st.error(" The solver couldn't find a way to make it work. Check if every required workstream has at least one person available.")
+                 st.error(" The solver couldn't find a way to make it work. Check if every required workstream has at least one person available and every scenario has a positive duration.")
                  return
 
-            st.success("Optimization Complete! We found the best schedule.")
-
-            # --- 3. Check Out the Results! ---
-            st.header("3. optimal UAT Schedule")
-            
-            # Key metric up front!
-            st.metric("Total UAT Duration ", f"{total_days:.1f} Days")
-
-            # Data Table
-            st.subheader("scheduled Details")
-            st.dataframe(schedule_df, width='stretch' )
-
-            # --- Gantt Chart Visualization ---
-            st.subheader("gantt chart visualization")
-            
-            # Prepping the data for the visual.
-            schedule_df['Start_DT'] = pd.to_datetime(schedule_df['Start Time'])
-            schedule_df['Finish_DT'] = pd.to_datetime(schedule_df['End Time'])
-            
-            # This is the final visual: Scenario is on the Y-axis, and we'll use the hover text to show who's assigned!
-            fig = px.timeline(
-                schedule_df,
-                x_start="Start_DT", 
-                x_end="Finish_DT", 
-                y="Scenario",
-                color="Workstreams",
-                hover_name="Scenario",
-                # Including the key details in the tooltip.
-                hover_data=['Assigned Persons', 'Workstreams', 'Duration (Hours)', 'Start Time', 'End Time'], 
-                title="UAT Scenario Timeline by Resource Allocation"
-            )
-            fig.update_yaxes(autorange="reversed") 
-            st.plotly_chart(fig, use_container_width=True, config={})
+            if is_optimal:
+                st.success("Optimization Complete! We found the best schedule.")
+            else:
+                st.warning(
+                    f"The solver hit its {time_limit}s time limit, so this is the best schedule it found, "
+                    "but it may not be optimal. Try again with a higher time limit or more workers."
+                )
+
+            st.session_state['last'] = (inputs_hash, schedule_df, total_days, is_optimal)
+            show_results(schedule_df, total_days, is_optimal)
+
+    elif 'last' in st.session_state and st.session_state['last'][0] == inputs_hash:
+        # Nothing changed since the last run, so just show that schedule again instead of re-solving.
+        _, schedule_df, total_days, is_optimal = st.session_state['last']
+        show_results(schedule_df, total_days, is_optimal)
 
 if __name__ == '__main__':
     app()
\ No newline at end of file
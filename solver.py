@@ -1,29 +1,70 @@
 # solver.py - UPDATED FOR MULTI-RESOURCE SCHEDULING
 
+from collections import Counter
 from ortools.sat.python import cp_model
+import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
+import ciso8601 # C-level ISO 8601 parsing, much quicker than datetime.strptime
 
-def find_optimal_schedule(scenarios, personnel, start_date_str):
-    """Calculates the optimal multi-resource UAT schedule using CP-SAT."""
+def find_optimal_schedule(scenarios, personnel, start_date_str, num_workers=8, max_time_in_seconds=30.0):
+    """Calculates the optimal multi-resource UAT schedule using CP-SAT.
+
+    Returns (schedule_df, total_days, status), where status is the CP-SAT status name
+    ('OPTIMAL', 'FEASIBLE', 'UNKNOWN', 'INFEASIBLE' or 'MODEL_INVALID').
+    """
     
-    model = cp_model.CpModel()
-    start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
+    start_date = ciso8601.parse_datetime(start_date_str)
     
-    people_map = {p['name']: i for i, p in enumerate(personnel)}
+    # Group personnel indices by workstream once, instead of re-scanning per requirement
+    ws_to_people = {}
+    for person_index, p in enumerate(personnel):
+        ws_to_people.setdefault(p['workstream'], []).append(person_index)
+
+    # Convert all durations in one go (blank or non-numeric ones become NaN and are caught below)
+    durations = pd.to_numeric(
+        pd.Series([scenario['duration_hours'] for scenario in scenarios], dtype=object), errors='coerce'
+    ).to_numpy(dtype=float)
+
+    # How many sub-tasks need each workstream
+    ws_demand = Counter(ws for scenario in scenarios for ws in scenario['required_workstreams'])
+
+    # --- 0. Catch Impossible Inputs Before Building Anything ---
+
+    # If no person exists for a required workstream, the problem is infeasible, no need to ask the solver
+    missing_workstreams = [ws for ws in ws_demand if not ws_to_people.get(ws)]
+    if missing_workstreams:
+        print(f"ERROR: No personnel found for workstream(s): {', '.join(map(str, missing_workstreams))}")
+        return pd.DataFrame(), None, 'INFEASIBLE'
+
+    if not (np.isfinite(durations) & (durations > 0)).all():
+        print("ERROR: Every scenario needs a numeric duration of at least one hour")
+        return pd.DataFrame(), None, 'MODEL_INVALID'
+    durations = durations.astype(np.int64)
+
+    model = cp_model.CpModel()
     
     # --- Store ALL Sub-tasks (One per required workstream) ---
     all_subtasks = []
+
+    # One shared end variable per scheduled scenario, for the objective
+    scenario_end_vars = []
+
+    # Optional intervals (and their assignment Booleans) per person, filled while building the sub-tasks.
+    # Every sub-task puts one interval on each candidate, so the interval lists can be sized up front.
+    person_to_intervals = [[None] * ws_demand[p['workstream']] for p in personnel]
+    interval_cursor = [0] * len(personnel)
+    person_to_bools = [[] for _ in personnel]
     
-    # Earliest start/Latest end: Assuming a 60-day horizon (1440 hours) for long tasks
+    # Earliest start/Latest end: Running every scenario back-to-back is always a valid
+    # schedule, so the total duration is a safe (and much tighter) horizon than a fixed 60 days
     earliest_start = 0 
-    horizon = 60 * 24 
+    horizon = int(durations.sum())
 
     # --- 1. Create Model Variables for Each Scenario Component ---
     
     for scenario_idx, scenario in enumerate(scenarios):
         scenario_name = scenario['name']
-        duration_hours = int(scenario['duration_hours'])
+        duration_hours = int(durations[scenario_idx])
         
         # All sub-tasks for this scenario must share the SAME start/end time.
         start_var = model.NewIntVar(earliest_start, horizon, f'{scenario_name}_start')
@@ -32,126 +73,150 @@ def find_optimal_schedule(scenarios, personnel, start_date_str):
         # Link start, duration, and end (Mandatory interval)
         model.Add(end_var == start_var + duration_hours)
 
+        # Scenarios without any required workstream never get scheduled, so they don't count
+        if scenario['required_workstreams']:
+            scenario_end_vars.append(end_var)
+
         for ws_idx, required_workstream in enumerate(scenario['required_workstreams']):
             task_suffix = f'_{scenario_idx}_{ws_idx}'
             
             # --- Sub-task Constraints (Resource Selection) ---
-            
-            # 1. Resource Variable: Which person is assigned (index)
-            assigned_person_var = model.NewIntVar(0, len(personnel) - 1, 'person' + task_suffix)
-
-            # 2. Constraint: Workstream Requirement
-            valid_people_indices = [
-                people_map[p['name']] 
-                for p in personnel 
-                if p['workstream'] == required_workstream
-            ]
-            
-            # Restrict the person variable to those in the required workstream
-            if valid_people_indices:
-                model.AddAllowedAssignments([assigned_person_var], [(idx,) for idx in valid_people_indices])
+
+            # 1. Constraint: Workstream Requirement (only these people are candidates)
+            valid_people_indices = ws_to_people[required_workstream]
+
+            if len(valid_people_indices) == 1:
+                # 2. Create Interval Variable for No-Overlap Constraint
+                # Only one person can do it, so there is nothing to choose: a mandatory
+                # interval (fixed duration, linked to the shared start/end) goes straight
+                # onto their timeline, no Booleans needed.
+                interval = model.NewIntervalVar(start_var, duration_hours, end_var, 'interval' + task_suffix)
+                assigned_bools = []
+                person_index = valid_people_indices[0]
+                person_to_intervals[person_index][interval_cursor[person_index]] = interval
+                interval_cursor[person_index] += 1
             else:
-                 # If no person exists for a required workstream, this makes the problem infeasible
-                 print(f"ERROR: No personnel found for workstream: {required_workstream}")
+                # 2. Resource Variables: One Boolean per candidate person, exactly one is picked
+                assigned_bools = [
+                    model.NewBoolVar(f'x{task_suffix}_{person_index}')
+                    for person_index in valid_people_indices
+                ]
+                model.AddExactlyOne(assigned_bools)
 
-            # 3. Create Interval Variable for No-Overlap Constraint
-            # Note: We must use a fixed duration here, linked to the shared start/end.
-            interval = model.NewIntervalVar(start_var, duration_hours, end_var, 'interval' + task_suffix)
+                # Optional Interval per candidate: active only if that person is assigned
+                for person_index, is_assigned_to_person in zip(valid_people_indices, assigned_bools):
+                    optional_interval = model.NewOptionalIntervalVar(
+                        start_var, 
+                        duration_hours, 
+                        end_var, 
+                        is_assigned_to_person, 
+                        f'optional_interval{task_suffix}_{person_index}'
+                    )
+                    person_to_intervals[person_index][interval_cursor[person_index]] = optional_interval
+                    interval_cursor[person_index] += 1
+                    person_to_bools[person_index].append(is_assigned_to_person)
             
             # Store the sub-task for solver processing and output
             all_subtasks.append({
+                'scenario_idx': scenario_idx,
                 'scenario_name': scenario_name,
                 'workstream': required_workstream,
                 'duration': duration_hours,
                 'start': start_var,
                 'end': end_var,
-                'person': assigned_person_var,
-                'interval': interval
+                'valid_people': valid_people_indices,
+                'assigned_bools': assigned_bools
             })
 
     # --- 2. Constraint: No Two Tasks on the Same Person at the Same Time ---
-    
-    person_to_intervals = [[] for _ in personnel]
-
-    for subtask in all_subtasks:
-        
-        # Create Boolean variables to link the subtask to its assigned person
-        for person_index in range(len(personnel)):
-            is_assigned_to_person = model.NewBoolVar(f'is_subtask_{subtask["scenario_name"]}_to_person_{person_index}')
-            
-            # Link Boolean to person variable
-            model.Add(subtask['person'] == person_index).OnlyEnforceIf(is_assigned_to_person)
-            model.Add(subtask['person'] != person_index).OnlyEnforceIf(is_assigned_to_person.Not())
-
-            # Create an Optional Interval: active only if the person is assigned
-            optional_interval = model.NewOptionalIntervalVar(
-                subtask['start'], 
-                subtask['duration'], 
-                subtask['end'], 
-                is_assigned_to_person, 
-                f'optional_interval_{subtask["scenario_name"]}_{person_index}'
-            )
-            
-            person_to_intervals[person_index].append(optional_interval)
 
     # Add the NoOverlap constraint for each person (resource)
     for person_intervals in person_to_intervals:
         model.AddNoOverlap(person_intervals)
 
+    # Symmetry Breaking: people in the same workstream are interchangeable, so only
+    # let someone be used if the person listed before them (same workstream) is used too.
+    for people_indices in ws_to_people.values():
+        if len(people_indices) < 2 or not person_to_bools[people_indices[0]]:
+            continue
+
+        person_used = []
+        for person_index in people_indices:
+            is_used = model.NewBoolVar(f'used_{person_index}')
+            model.AddMaxEquality(is_used, person_to_bools[person_index])
+            person_used.append(is_used)
+
+        for previous_used, current_used in zip(person_used, person_used[1:]):
+            model.AddImplication(current_used, previous_used)
 
     # --- 3. Objective Function: Minimize Total UAT Time ---
     
     # Find the maximum end time across all shared scenario end variables
-    all_end_vars = list(set([subtask['end'] for subtask in all_subtasks]))
-    
     max_end_time = model.NewIntVar(0, horizon, 'max_end_time')
-    model.AddMaxEquality(max_end_time, all_end_vars)
+    model.AddMaxEquality(max_end_time, scenario_end_vars)
     
     model.Minimize(max_end_time)
     
     # --- 4. Solve and Format Output ---
     
     solver = cp_model.CpSolver()
+    # Run a portfolio of search strategies in parallel, and don't keep the UI waiting forever
+    solver.parameters.num_workers = num_workers
+    solver.parameters.max_time_in_seconds = max_time_in_seconds
+    solver.parameters.log_search_progress = False
     status = solver.Solve(model)
 
     if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
-        # Re-group the results by the original scenario name
-        scenario_results = {}
-        
+        # Which person ended up on each sub-task, as flat arrays (one entry per sub-task)
+        person_names = np.array([p['name'] for p in personnel], dtype=object)
+        person_workstreams = np.array([p['workstream'] for p in personnel], dtype=object)
+        subtask_scenarios = np.fromiter(
+            (subtask['scenario_idx'] for subtask in all_subtasks), dtype=int, count=len(all_subtasks)
+        )
+        subtask_persons = np.fromiter(
+            (
+                subtask['valid_people'][0] if len(subtask['valid_people']) == 1 else next(
+                    idx for idx, is_assigned in zip(subtask['valid_people'], subtask['assigned_bools'])
+                    if solver.Value(is_assigned)
+                )
+                for subtask in all_subtasks
+            ),
+            dtype=int,
+            count=len(all_subtasks)
+        )
+
+        # Re-group the results by the original scenario (by position, no string keys needed)
+        assignments = pd.DataFrame({
+            'Assigned Persons': person_names[subtask_persons],
+            'Workstreams': person_workstreams[subtask_persons]
+        }, index=subtask_scenarios)
+        grouped = assignments.groupby(level=0, sort=False).agg(lambda values: ", ".join(sorted(values)))
+
+        # Get solved times (all subtasks of a scenario share the same start/end, so the first one is enough)
+        first_subtasks = [None] * len(scenarios)
         for subtask in all_subtasks:
-            scenario_name = subtask['scenario_name']
-            
-            # Get solved values (all subtasks of a scenario will have the same start/end time)
-            start_hour_offset = solver.Value(subtask['start'])
-            end_hour_offset = solver.Value(subtask['end'])
-            person_index = solver.Value(subtask['person'])
-            
-            assigned_person = personnel[person_index]['name']
-            assigned_workstream = personnel[person_index]['workstream']
-            
-            if scenario_name not in scenario_results:
-                start_dt = start_date + timedelta(hours=start_hour_offset)
-                end_dt = start_date + timedelta(hours=end_hour_offset)
-                
-                scenario_results[scenario_name] = {
-                    'Scenario': scenario_name,
-                    'Duration (Hours)': subtask['duration'],
-                    'Start Time': start_dt.strftime('%Y-%m-%d %H:%M'),
-                    'End Time': end_dt.strftime('%Y-%m-%d %H:%M'),
-                    'Assigned Persons': [],
-                    'Workstreams': []
-                }
-            
-            scenario_results[scenario_name]['Assigned Persons'].append(assigned_person)
-            scenario_results[scenario_name]['Workstreams'].append(assigned_workstream)
-
-        final_results = []
-        for res in scenario_results.values():
-            # Format the output lists for display
-            res['Assigned Persons'] = ", ".join(sorted(res['Assigned Persons']))
-            res['Workstreams'] = ", ".join(sorted(res['Workstreams']))
-            final_results.append(res)
+            if first_subtasks[subtask['scenario_idx']] is None:
+                first_subtasks[subtask['scenario_idx']] = subtask
+        scheduled = [
+            (scenario_idx, subtask) for scenario_idx, subtask in enumerate(first_subtasks) if subtask is not None
+        ]
+
+        start_offsets = [solver.Value(subtask['start']) for _, subtask in scheduled]
+        end_offsets = [solver.Value(subtask['end']) for _, subtask in scheduled]
+        start_dts = pd.Timestamp(start_date) + pd.to_timedelta(start_offsets, unit='h')
+        end_dts = pd.Timestamp(start_date) + pd.to_timedelta(end_offsets, unit='h')
+
+        # Fixed-width dtypes keep the frame cheap to hash and serialize; times stay real timestamps
+        # (the UI formats them for display)
+        final_results = pd.DataFrame({
+            'Scenario': pd.Categorical([subtask['scenario_name'] for _, subtask in scheduled]),
+            'Duration (Hours)': np.array([subtask['duration'] for _, subtask in scheduled], dtype=np.int32),
+            'Start_DT': start_dts.astype('datetime64[ns]'),
+            'Finish_DT': end_dts.astype('datetime64[ns]')
+        }, index=[scenario_idx for scenario_idx, _ in scheduled]).join(grouped).reset_index(drop=True)
             
-        return pd.DataFrame(final_results), solver.ObjectiveValue() / 24.0
+        # FEASIBLE means the time limit ran out before CP-SAT could prove this is the best schedule
+        return final_results, solver.ObjectiveValue() / 24.0, solver.StatusName(status)
     
-    return pd.DataFrame(), None
\ No newline at end of file
+    # UNKNOWN means the time limit ran out before any schedule was found (not that there isn't one)
+    return pd.DataFrame(), None, solver.StatusName(status)
\ No newline at end of file